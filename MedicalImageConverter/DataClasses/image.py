@@ -12,16 +12,101 @@ Structure:
 """
 
 import os
-import numpy as np
-import pandas as pd
-
-import vtk
-from vtkmodules.util import numpy_support
+import json
+import pickle
+from itertools import count
+from collections.abc import Sequence
 
+import numpy as np
 import SimpleITK as sitk
+from pydicom.tag import Tag
 
 from .poi import Poi
 from .roi import Roi
+from .tags import Tags
+
+DATE_KEYS = ('SeriesDate', 'ContentDate', 'AcquisitionDate', 'StudyDate')
+TIME_KEYS = ('SeriesTime', 'ContentTime', 'AcquisitionTime', 'StudyTime')
+HEADER_KEYS = (('PatientName', 'PatientID') + DATE_KEYS + TIME_KEYS +
+               ('StudyInstanceUID', 'SeriesInstanceUID', 'FrameOfReferenceUID', 'WindowCenter', 'WindowWidth'))
+SAVE_FORMAT_VERSION = 1
+ARRAY_FIELDS = ('spacing', 'dimensions', 'orientation', 'origin', 'image_matrix', 'camera_position', 'slice_location')
+
+
+def json_value(value):
+    """
+    Converts the numpy and pydicom values stored on an Image to types json can write.
+    """
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    elif isinstance(value, np.generic):
+        return value.item()
+    elif isinstance(value, Sequence):
+        return list(value)
+    else:
+        return str(value)
+
+
+def array_range(array, block_bytes=1 << 20):
+    """
+    Min and max of the array in one pass over memory. Each ~1MB block of slices is reduced for both while it is still
+    in cache, instead of streaming the whole volume through memory twice.
+    """
+    if array.ndim < 2 or array.size == 0:
+        return [np.min(array), np.max(array)]
+
+    step = max(1, block_bytes // max(1, array[0].nbytes))
+    low, high = None, None
+    for ii in range(0, array.shape[0], step):
+        block = array[ii:ii + step]
+        block_low, block_high = block.min(), block.max()
+        if low is None or block_low < low:
+            low = block_low
+        if high is None or block_high > high:
+            high = block_high
+
+    return [low, high]
+
+
+def pack_positions(positions):
+    """
+    Flattens a list of per structure contour lists into one (N, 3) point array, the number of points in each contour
+    and the number of contours in each structure (-1 for a structure without contours).
+    """
+    counts = np.array([-1 if contours is None else len(contours) for contours in positions], dtype=np.int64)
+    contours = [np.asarray(points, dtype=np.float64).reshape(-1, 3) for contour_list in positions
+                if contour_list is not None for points in contour_list]
+    lengths = np.array([len(points) for points in contours], dtype=np.int64)
+    if contours:
+        points = np.concatenate(contours)
+    else:
+        points = np.empty((0, 3), dtype=np.float64)
+
+    return points, lengths, counts
+
+
+def unpack_positions(points, lengths, counts):
+    """
+    Inverse of pack_positions, the contours are returned as views into the point array.
+    """
+    contours = np.split(points, np.cumsum(lengths)[:-1])
+    starts = np.concatenate(([0], np.cumsum(np.maximum(counts, 0))))
+
+    return [None if count < 0 else contours[starts[ii]:starts[ii + 1]] for ii, count in enumerate(counts)]
+
+
+def pack_colors(colors):
+    """
+    Stacks the structure colors into an (N, 3) uint8 array, a structure without a color gets a zero row and is marked
+    False in the returned has color flags.
+    """
+    has_color = np.array([color is not None for color in colors], dtype=bool)
+    rows = np.zeros((len(colors), 3), dtype=np.uint8)
+    for ii, color in enumerate(colors):
+        if color is not None:
+            rows[ii] = color
+
+    return rows, has_color
 
 
 class Image(object):
@@ -59,11 +144,14 @@ class Image(object):
         self.sections = None
         self.rgb = False
 
-        self.slice_location = (0, 0, 0)
+        self.slice_location = np.zeros(3, dtype=np.int64)
+
+        self._header = {}
 
     def input(self, image):
-        self.tags = image.image_set
+        self.tags = Tags(image.image_set)
         self.array = image.array
+        self._header = self._read_header()
 
         self.patient_name = self.get_patient_name()
         self.mrn = self.get_mrn()
@@ -93,12 +181,12 @@ class Image(object):
 
     def input_rtstruct(self, rtstruct):
         for ii, roi_name in enumerate(rtstruct.roi_names):
-            if roi_name not in list(self.rois.keys()):
+            if roi_name not in self.rois:
                 self.rois[roi_name] = Roi(self, position=rtstruct.contours[ii], name=roi_name,
                                           color=rtstruct.roi_colors[ii], visible=False, filepaths=rtstruct.filepaths)
 
         for ii, poi_name in enumerate(rtstruct.poi_names):
-            if poi_name not in list(self.pois.keys()):
+            if poi_name not in self.pois:
                 self.pois[poi_name] = Poi(self, position=rtstruct.points[ii], name=poi_name,
                                           color=rtstruct.poi_colors[ii], visible=False, filepaths=rtstruct.filepaths)
 
@@ -110,102 +198,79 @@ class Image(object):
         self.pois[poi_name] = Poi(self, poi_name, color, visible, path)
         self.pois[poi_name].point_position = point
 
+    def _read_header(self):
+        dataset = self.tags[0]
+        return {key: dataset[key].value for key in HEADER_KEYS if key in dataset}
+
     def get_patient_name(self):
-        if 'PatientName' in self.tags[0]:
-            return self.tags[0].PatientName
-        else:
-            return 'Name tag missing'
+        return self._header.get('PatientName', 'Name tag missing')
 
     def get_mrn(self):
-        if 'PatientID' in self.tags[0]:
-            return self.tags[0].PatientID
-        else:
-            return 'MRN tag missing'
+        return self._header.get('PatientID', 'MRN tag missing')
 
     def get_date(self):
-        if 'SeriesDate' in self.tags[0]:
-            return self.tags[0].SeriesDate
-        elif 'ContentDate' in self.tags[0]:
-            return self.tags[0].ContentDate
-        elif 'AcquisitionDate' in self.tags[0]:
-            return self.tags[0].AcquisitionDate
-        elif 'StudyDate' in self.tags[0]:
-            return self.tags[0].StudyDate
-        else:
-            return '00000'
+        return next((self._header[key] for key in DATE_KEYS if key in self._header), '00000')
 
     def get_time(self):
-        if 'SeriesTime' in self.tags[0]:
-            return self.tags[0].SeriesTime
-        elif 'ContentTime' in self.tags[0]:
-            return self.tags[0].ContentTime
-        elif 'AcquisitionTime' in self.tags[0]:
-            return self.tags[0].AcquisitionTime
-        elif 'StudyTime' in self.tags[0]:
-            return self.tags[0].StudyTime
-        else:
-            return '00000'
+        return next((self._header[key] for key in TIME_KEYS if key in self._header), '00000')
 
     def get_study_uid(self):
-        if 'StudyInstanceUID' in self.tags[0]:
-            return self.tags[0].StudyInstanceUID
-        else:
-            return '00000.00000'
+        return self._header.get('StudyInstanceUID', '00000.00000')
 
     def get_series_uid(self):
-        if 'SeriesInstanceUID' in self.tags[0]:
-            return self.tags[0].SeriesInstanceUID
-        else:
-            return '00000.00000'
+        return self._header.get('SeriesInstanceUID', '00000.00000')
 
     def get_frame_ref(self):
-        if 'FrameOfReferenceUID' in self.tags[0]:
-            return self.tags[0].FrameOfReferenceUID
-        else:
-            return '00000.00000'
+        return self._header.get('FrameOfReferenceUID', '00000.00000')
 
     def get_window(self):
-        if (0x0028, 0x1050) in self.tags[0] and (0x0028, 0x1051) in self.tags[0]:
-            center = self.tags[0].WindowCenter
-            width = self.tags[0].WindowWidth
+        if 'WindowCenter' in self._header and 'WindowWidth' in self._header:
+            center = self._header['WindowCenter']
+            width = self._header['WindowWidth']
 
-            if not isinstance(center, float):
+            if not isinstance(center, (int, float)):
                 center = center[0]
 
-            if not isinstance(width, float):
+            if not isinstance(width, (int, float)):
                 width = width[0]
 
-            return [int(center) - int(np.round(width / 2)), int(center) + int(np.round(width / 2))]
+            half = int(round(width / 2))
+            return [int(center) - half, int(center) + half]
 
         elif self.array is not None:
-            return [np.min(self.array), np.max(self.array)]
+            return array_range(self.array)
 
         else:
             return [0, 1]
 
     def get_specific_tag(self, tag):
-        if tag in self.tags[0]:
-            return self.tags[0][tag]
-        else:
+        try:
+            tag = Tag(tag)
+        except ValueError:
             return None
 
+        return self.tags[0].get(tag)
+
     def get_specific_tag_on_all_files(self, tag):
         if tag in self.tags[0]:
-            return [t[tag] for t in self.tags]
+            return self.tags.get_all(tag)
         else:
             return None
 
-    def save_image(self, path, rois=True, pois=True):
-        variable_names = self.__dict__.keys()
-        column_names = [name for name in variable_names if name not in ['rois', 'pois', 'tags', 'array']]
-
-        df = pd.DataFrame(index=[0], columns=column_names)
-        for name in column_names:
-            df.at[0, name] = getattr(self, name)
-
-        df.to_pickle(os.path.join(path, 'info.p'))
-        np.save(os.path.join(path, 'tags.npy'), self.tags, allow_pickle=True)
-        np.save(os.path.join(path, 'array.npy'), self.array, allow_pickle=True)
+    def save_image(self, path, rois=True, pois=True, compress=False):
+        info = {name: value for name, value in self.__dict__.items() if name not in ['rois', 'pois', 'tags', 'array']
+                and not name.startswith('_')}
+        info['format_version'] = SAVE_FORMAT_VERSION
+        with open(os.path.join(path, 'info.json'), 'w') as f:
+            json.dump(info, f, default=json_value)
+
+        with open(os.path.join(path, 'tags.p'), 'wb') as f:
+            pickle.dump(self.tags, f, protocol=pickle.HIGHEST_PROTOCOL)
+        if self.array is not None:
+            if compress:
+                np.savez_compressed(os.path.join(path, 'array.npz'), array=self.array)
+            else:
+                np.save(os.path.join(path, 'array.npy'), self.array, allow_pickle=False)
 
         if rois:
             self.save_rois(path, create_main_folder=True)
@@ -218,108 +283,139 @@ class Image(object):
             path = os.path.join(path, 'ROIs')
             os.mkdir(path)
 
-        for name in list(self.rois.keys()):
-            roi_path = os.path.join(os.path.join(path, name))
-            os.mkdir(roi_path)
-
-            np.save(os.path.join(roi_path, 'name.npy'), self.rois[name].name, allow_pickle=True)
-            np.save(os.path.join(roi_path, 'visible.npy'), self.rois[name].visible, allow_pickle=True)
-            np.save(os.path.join(roi_path, 'color.npy'), self.rois[name].color, allow_pickle=True)
-            np.save(os.path.join(roi_path, 'filepaths.npy'), self.rois[name].filepaths, allow_pickle=True)
-            if self.rois[name].contour_position is not None:
-                np.save(os.path.join(roi_path, 'contour_position.npy'),
-                        np.array(self.rois[name].contour_position, dtype=object),
-                        allow_pickle=True)
+        rois = list(self.rois.values())
+        points, lengths, counts = pack_positions([roi.contour_position for roi in rois])
+        visible = np.array([roi.visible for roi in rois], dtype=bool)
+        colors, has_color = pack_colors([roi.color for roi in rois])
+        np.savez_compressed(os.path.join(path, 'rois.npz'),
+                            names=np.array([roi.name for roi in rois], dtype=str),
+                            visible=np.packbits(visible),
+                            colors=colors,
+                            has_color=np.packbits(has_color),
+                            filepaths=np.array([roi.filepaths for roi in rois], dtype=str),
+                            contour_points=points,
+                            contour_lengths=lengths,
+                            contour_counts=counts)
 
     def save_pois(self, path, create_main_folder=False):
         if create_main_folder:
             path = os.path.join(path, 'POIs')
             os.mkdir(path)
 
-        for name in list(self.pois.keys()):
-            poi_path = os.path.join(os.path.join(path, name))
-            os.mkdir(poi_path)
-
-            np.save(os.path.join(poi_path, 'name.npy'), self.pois[name].name, allow_pickle=True)
-            np.save(os.path.join(poi_path, 'visible.npy'), self.pois[name].visible, allow_pickle=True)
-            np.save(os.path.join(poi_path, 'color.npy'), self.pois[name].color, allow_pickle=True)
-            np.save(os.path.join(poi_path, 'filepaths.npy'), self.pois[name].filepaths, allow_pickle=True)
-            np.save(os.path.join(poi_path, 'point_position.npy'), self.pois[name].point_position, allow_pickle=True)
+        pois = list(self.pois.values())
+        points, lengths, counts = pack_positions([None if poi.point_position is None else [poi.point_position]
+                                                  for poi in pois])
+        visible = np.array([poi.visible for poi in pois], dtype=bool)
+        colors, has_color = pack_colors([poi.color for poi in pois])
+        np.savez_compressed(os.path.join(path, 'pois.npz'),
+                            names=np.array([poi.name for poi in pois], dtype=str),
+                            visible=np.packbits(visible),
+                            colors=colors,
+                            has_color=np.packbits(has_color),
+                            filepaths=np.array([poi.filepaths for poi in pois], dtype=str),
+                            point_points=points,
+                            point_lengths=lengths,
+                            point_counts=counts)
 
     def load_image(self, image_path, rois=True, pois=True):
-
-        self.array = np.load(os.path.join(image_path, 'array.npy'), allow_pickle=True)
-        self.tags = np.load(os.path.join(image_path, 'tags.npy'), allow_pickle=True)
-        info = pd.read_pickle(os.path.join(image_path, 'info.p'),)
-        for column in list(info.columns):
-            setattr(self, column, info.at[0, column])
-
-        if rois:
-            roi_names = os.listdir(os.path.join(image_path, 'ROIs'))
-            for name in roi_names:
-                self.load_rois(os.path.join(image_path, 'ROIs', name))
-
-        if pois:
-            roi_names = os.listdir(os.path.join(image_path, 'POIs'))
-            for name in roi_names:
-                self.load_pois(os.path.join(image_path, 'POIs', name))
+        info_path = os.path.join(image_path, 'info.json')
+        info = None
+        if os.path.exists(info_path):
+            with open(info_path, 'r') as f:
+                info = json.load(f)
+
+        if info is None or info.pop('format_version', None) != SAVE_FORMAT_VERSION:
+            raise ValueError('load_image: ' + image_path + ' was not saved in format version ' +
+                             str(SAVE_FORMAT_VERSION) + ' (info.json with format_version), directories written by '
+                             'older versions of save_image (info.p, tags.npy, one folder per ROI/POI) can no longer '
+                             'be loaded, re-create the image from its source files and save it again')
+
+        array_path = os.path.join(image_path, 'array.npy')
+        if os.path.exists(array_path):
+            self.array = np.load(array_path, mmap_mode='r')
+        elif os.path.exists(os.path.join(image_path, 'array.npz')):
+            with np.load(os.path.join(image_path, 'array.npz')) as array_file:
+                self.array = array_file['array']
+        with open(os.path.join(image_path, 'tags.p'), 'rb') as f:
+            self.tags = pickle.load(f)
+        self._header = self._read_header()
+        for name in ARRAY_FIELDS:
+            if info.get(name) is not None:
+                info[name] = np.asarray(info[name])
+        self.__dict__.update(info)
+
+        roi_path = os.path.join(image_path, 'ROIs', 'rois.npz')
+        if rois and os.path.exists(roi_path):
+            self.load_rois(roi_path)
+
+        poi_path = os.path.join(image_path, 'POIs', 'pois.npz')
+        if pois and os.path.exists(poi_path):
+            self.load_pois(poi_path)
 
     def load_rois(self, roi_path):
-        name = str(np.load(os.path.join(roi_path, 'name.npy'), allow_pickle=True))
-
-        existing_rois = list(self.rois.keys())
-        if name in existing_rois:
-            n = 0
-            while n >= 0:
-                n += 1
-                new_name = name + '_' + str(n)
-                if new_name not in existing_rois:
-                    name = new_name
-                    n = -1
-
-        self.rois[name] = Roi(self)
-        self.rois[name].name = name
-        self.rois[name].visible = bool(np.load(os.path.join(roi_path, 'visible.npy'), allow_pickle=True))
-        self.rois[name].color = list(np.load(os.path.join(roi_path, 'color.npy'), allow_pickle=True))
-        self.rois[name].filepaths = str(np.load(os.path.join(roi_path, 'filepaths.npy'), allow_pickle=True))
-
-        if os.path.exists(os.path.join(roi_path, 'contour_position.npy')):
-            self.rois[name].contour_position = list(np.load(os.path.join(roi_path, 'contour_position.npy'),
-                                                            allow_pickle=True))
+        with np.load(roi_path, allow_pickle=False) as roi_fields:
+            names = roi_fields['names']
+            visible = np.unpackbits(roi_fields['visible'], count=len(names)).astype(bool)
+            colors = roi_fields['colors']
+            if 'has_color' in roi_fields:
+                has_color = np.unpackbits(roi_fields['has_color'], count=len(names)).astype(bool)
+            else:
+                has_color = np.ones(len(names), dtype=bool)
+            filepaths_list = roi_fields['filepaths']
+            positions = unpack_positions(roi_fields['contour_points'], roi_fields['contour_lengths'],
+                                         roi_fields['contour_counts'])
+
+        for name, vis, color, has, filepaths, position in zip(names, visible, colors, has_color, filepaths_list,
+                                                              positions):
+            name = str(name)
+            if name in self.rois:
+                candidates = (name + '_' + str(n) for n in count(1))
+                name = next(new_name for new_name in candidates if new_name not in self.rois)
+
+            roi = Roi(self)
+            roi.name = name
+            roi.visible = bool(vis)
+            roi.color = color.tolist() if has else None
+            roi.filepaths = str(filepaths)
+            roi.contour_position = position
+            self.rois[name] = roi
 
     def load_pois(self, poi_path):
-        name = str(np.load(os.path.join(poi_path, 'name.npy'), allow_pickle=True))
-
-        existing_pois = list(self.pois.keys())
-        if name in existing_pois:
-            n = 0
-            while n >= 0:
-                n += 1
-                new_name = name + '_' + str(n)
-                if new_name not in existing_pois:
-                    name = new_name
-                    n = -1
-
-        self.pois[name] = poi(self)
-        self.pois[name].name = name
-        self.pois[name].visible = bool(np.load(os.path.join(poi_path, 'visible.npy'), allow_pickle=True))
-        self.pois[name].color = list(np.load(os.path.join(poi_path, 'color.npy'), allow_pickle=True))
-        self.pois[name].filepaths = str(np.load(os.path.join(poi_path, 'filepaths.npy'), allow_pickle=True))
-
-        if os.path.exists(os.path.join(poi_path, 'point_position.npy')):
-            self.rois[name].contour_position = list(np.load(os.path.join(poi_path, 'point_position.npy'),
-                                                            allow_pickle=True))
+        with np.load(poi_path, allow_pickle=False) as poi_fields:
+            names = poi_fields['names']
+            visible = np.unpackbits(poi_fields['visible'], count=len(names)).astype(bool)
+            colors = poi_fields['colors']
+            if 'has_color' in poi_fields:
+                has_color = np.unpackbits(poi_fields['has_color'], count=len(names)).astype(bool)
+            else:
+                has_color = np.ones(len(names), dtype=bool)
+            filepaths_list = poi_fields['filepaths']
+            positions = unpack_positions(poi_fields['point_points'], poi_fields['point_lengths'],
+                                         poi_fields['point_counts'])
+
+        for name, vis, color, has, filepaths, position in zip(names, visible, colors, has_color, filepaths_list,
+                                                              positions):
+            name = str(name)
+            if name in self.pois:
+                candidates = (name + '_' + str(n) for n in count(1))
+                name = next(new_name for new_name in candidates if new_name not in self.pois)
+
+            poi = Poi(self)
+            poi.name = name
+            poi.visible = bool(vis)
+            poi.color = color.tolist() if has else None
+            poi.filepaths = str(filepaths)
+            poi.point_position = None if position is None else position[0]
+            self.pois[name] = poi
 
     def create_sitk_image(self, empty=False):
         if empty:
-            sitk_image = sitk.Image([int(dim) for dim in self.dimensions], sitk.sitkUInt8)
+            sitk_image = sitk.Image(np.asarray(self.dimensions, dtype=int).tolist(), sitk.sitkUInt8)
         else:
             sitk_image = sitk.GetImageFromArray(self.array)
 
-        matrix_flat = self.image_matrix[0:3, 0:3].flatten(order='F')
-        sitk_image.SetDirection([float(mat) for mat in matrix_flat])
+        sitk_image.SetDirection(self.image_matrix[0:3, 0:3].flatten(order='F').tolist())
         sitk_image.SetOrigin(self.origin)
         sitk_image.SetSpacing(self.spacing)
 
         return sitk_image
-    
\ No newline at end of file
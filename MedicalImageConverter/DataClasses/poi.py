@@ -11,7 +11,6 @@ Structure:
 
 """
 
-import copy
 import numpy as np
 
 
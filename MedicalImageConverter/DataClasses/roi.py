@@ -11,12 +11,7 @@ Structure:
 
 """
 
-import copy
-import numpy as np
-
-import SimpleITK as sitk
-
-from ..conversion import ContourToDiscreteMesh
+from ..conversion import ContourToDiscreteMesh, positions_to_pixels
 
 
 class Roi(object):
@@ -43,13 +38,8 @@ class Roi(object):
         self.bounds = None
 
     def convert_position_to_pixel(self):
-        sitk_image = self.image.create_sitk_image(empty=True)
-
-        pixel = [[]] * len(self.contour_position)
-        for ii, contours in enumerate(self.contour_position):
-            pixel[ii] = np.asarray([sitk_image.TransformPhysicalPointToContinuousIndex(contour) for contour in contours])
-            
-        return pixel
+        return positions_to_pixels(self.contour_position, self.image.image_matrix, self.image.origin,
+                                   self.image.spacing)
 
     def create_discrete_mesh(self):
         meshing = ContourToDiscreteMesh(contour_pixel=self.contour_pixel,
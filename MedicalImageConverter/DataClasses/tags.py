@@ -0,0 +1,97 @@
+"""
+Morfeus lab
+The University of Texas
+MD Anderson Cancer Center
+Author - Caleb O'Connor
+Email - csoconnor@mdanderson.org
+
+Description:
+    Compact storage of the per-slice dicom tags of an image. The first dataset is kept in full, for every other slice
+    only the elements that differ from the first dataset are kept.
+
+Structure:
+    Tags
+        first - dataset of the first slice
+        varying - {tag: [element per slice]} for the tags that are not identical on every slice
+        file_metas - file meta dataset of each slice
+        filenames - file each slice was read from
+
+"""
+
+from pydicom.dataset import Dataset
+
+
+class Tags(object):
+    def __init__(self, datasets):
+        self.first = datasets[0]
+        self.count = len(datasets)
+        self.varying = {}
+        self.file_metas = [getattr(dataset, 'file_meta', None) for dataset in datasets]
+        self.filenames = [getattr(dataset, 'filename', None) for dataset in datasets]
+
+        all_tags = set(self.first.keys())
+        for dataset in datasets[1:]:
+            all_tags.update(dataset.keys())
+
+        for tag in all_tags:
+            element = self.first.get(tag)
+            if any(dataset.get(tag) != element for dataset in datasets[1:]):
+                self.varying[tag] = [dataset.get(tag) for dataset in datasets]
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        for ii in range(self.count):
+            yield self[ii]
+
+    def __getitem__(self, index):
+        """
+        Index 0 returns the stored first dataset, other indices return a new dataset holding the first dataset's
+        elements with the slice's varying elements put over them, plus the slice's own file_meta and filename. The
+        elements that don't vary are shared with the first dataset, not copied. A slice of indices returns a list.
+
+        :param index: slice index
+        :type index: int | slice
+        :return: dataset of the slice
+        :rtype: pydicom Dataset
+        """
+        if isinstance(index, slice):
+            return [self[ii] for ii in range(*index.indices(self.count))]
+
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError('tag index out of range')
+
+        if index == 0:
+            return self.first
+
+        dataset = Dataset(dict(self.first.items()))
+        if self.file_metas[index] is not None:
+            dataset.file_meta = self.file_metas[index]
+        if self.filenames[index] is not None:
+            dataset.filename = self.filenames[index]
+        for tag, elements in self.varying.items():
+            if elements[index] is None:
+                if tag in dataset:
+                    del dataset[tag]
+            else:
+                dataset[tag] = elements[index]
+
+        return dataset
+
+    def get_all(self, tag):
+        """
+        Element of the tag on every slice, the first slices element is repeated when it doesn't vary.
+
+        :param tag: keyword or tag
+        :type tag: str | int
+        :return: element per slice
+        :rtype: list
+        """
+        element = self.first[tag]
+        if element.tag in self.varying:
+            return list(self.varying[element.tag])
+        else:
+            return [element] * self.count
@@ -16,25 +16,181 @@ import os
 import copy
 import time
 import gdcm
-import threading
+from functools import partial
+from operator import attrgetter
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
-import pandas as pd
 import pydicom as dicom
-from pydicom.uid import generate_uid
+from pydicom.uid import generate_uid, ImplicitVRLittleEndian, ExplicitVRLittleEndian
 
 from ..DataClasses import Image
 
+NATIVE_TRANSFER_SYNTAXES = (ImplicitVRLittleEndian, ExplicitVRLittleEndian)
 
-def thread_process_dicom(path, stop_before_pixels=False):
+# Elements larger than this (in practice PixelData) are left on disk by dcmread and only read when accessed, so files
+# that get filtered out never load their pixels and kept slices are read one at a time while the array is built
+PIXEL_DEFER_SIZE = '256 KB'
+
+# PatientPosition: (np.rot90 turns of the slices, which of the column/row directions the origin moves to the far edge
+# along, in-plane rotation applied to the row/column direction cosines) to bring the image to feet first supine
+POSITION_CORRECTIONS = {'HFDR': (3, [0, 1], [[0, -1], [1, 0]]),
+                        'FFDR': (3, [0, 1], [[0, -1], [1, 0]]),
+                        'HFP': (2, [1, 1], [[-1, 0], [0, -1]]),
+                        'FFP': (2, [1, 1], [[-1, 0], [0, -1]]),
+                        'HFDL': (1, [1, 0], [[0, 1], [-1, 0]]),
+                        'FFDL': (1, [1, 0], [[0, 1], [-1, 0]])}
+
+
+def thread_process_dicom(path, stop_before_pixels=False, defer_size=None):
     try:
-        datasets = dicom.dcmread(str(path), stop_before_pixels=stop_before_pixels)
+        datasets = dicom.dcmread(str(path), stop_before_pixels=stop_before_pixels, defer_size=defer_size)
     except:
         datasets = []
 
     return datasets
 
 
+def decimal_string_array(dataset, keyword):
+    """
+    Converts a DS (decimal string) element to a float64 array. If pydicom hasn't decoded the element yet the raw
+    bytes are parsed with a single numpy call, instead of pydicom creating a DSfloat object for every value.
+
+    :param dataset: dataset containing the element
+    :type dataset: pydicom Dataset
+    :param keyword: element keyword, e.g. ContourData
+    :type keyword: string
+    :return: element values
+    :rtype: numpy array
+    """
+    element = dataset.get_item(keyword)
+    if isinstance(element.value, bytes):
+        return np.fromstring(element.value.decode('ascii'), dtype=np.float64, sep='\\')
+
+    return np.asarray(element.value, dtype=np.float64)
+
+
+def cross3(a, b):
+    """
+    Cross product of two 3 element vectors, written out instead of going through np.cross's generic n-d path.
+
+    :param a: first vector
+    :type a: list | numpy array
+    :param b: second vector
+    :type b: list | numpy array
+    :return: a x b
+    :rtype: numpy array
+    """
+    return np.array((a[1] * b[2] - a[2] * b[1], a[2] * b[0] - a[0] * b[2], a[0] * b[1] - a[1] * b[0]),
+                    dtype=np.float64)
+
+
+def native_pixel_array(dataset):
+    """
+    Reads single frame, uncompressed little endian grayscale PixelData straight from the bytes already in memory,
+    skipping pydicom's pixel handler chain. Returns None when the dataset needs pydicom's handlers (compressed
+    transfer syntax, multi-frame, color, unusual bit depths) so the caller can fall back to pixel_array.
+
+    :param dataset: dataset read with its pixel data
+    :type dataset: pydicom Dataset
+    :return: 2D pixel array or None
+    :rtype: numpy array
+    """
+    file_meta = getattr(dataset, 'file_meta', None)
+    if 'PixelData' not in dataset or file_meta is None:
+        return None
+
+    if file_meta.get('TransferSyntaxUID') not in NATIVE_TRANSFER_SYNTAXES:
+        return None
+
+    if dataset.get('SamplesPerPixel', 1) != 1 or int(dataset.get('NumberOfFrames', 1) or 1) != 1:
+        return None
+
+    bits_allocated = dataset.get('BitsAllocated')
+    if bits_allocated not in (8, 16, 32):
+        return None
+
+    signed = dataset.get('PixelRepresentation', 0) == 1
+    dtype = np.dtype(('<i' if signed else '<u') + str(bits_allocated // 8))
+    rows, columns = dataset.Rows, dataset.Columns
+    pixel_data = dataset.PixelData
+    if len(pixel_data) < rows * columns * dtype.itemsize:
+        return None
+
+    array = np.frombuffer(pixel_data, dtype=dtype, count=rows * columns).reshape(rows, columns)
+
+    bits_stored = dataset.get('BitsStored', bits_allocated)
+    if bits_stored < bits_allocated:
+        shift = bits_allocated - bits_stored
+        if signed:
+            array = (array << shift) >> shift
+        else:
+            array = array & ((1 << bits_stored) - 1)
+
+    return array
+
+
+def decode_pixel_array(dataset):
+    """
+    Decodes the pixel array from a shallow copy of the dataset. The copy shares the elements with the dataset but
+    pydicom caches the decoded array on the copy, so the dataset that is kept as the image tags never holds onto a
+    decoded copy of its pixels.
+
+    :param dataset: dataset to decode
+    :type dataset: pydicom Dataset
+    :return: decoded pixels
+    :rtype: numpy array
+    """
+    return copy.copy(dataset).pixel_array
+
+
+def release_pixel_data(dataset):
+    """
+    Removes PixelData from the dataset. The datasets are kept as the image tags, without this each slice would hold
+    onto its encoded pixels after the array is created.
+
+    :param dataset: dataset the pixel array has been read from
+    :type dataset: pydicom Dataset
+    :return:
+    :rtype:
+    """
+    if 'PixelData' in dataset:
+        del dataset.PixelData
+
+
+def rescale_pixels(pixel_array, slope, intercept, out):
+    """
+    Writes (pixel_array*slope)+intercept into an int16 array in place. The common integer slope/intercept case is
+    done in int16 without any float temporaries, other values go through a single float64 buffer so the result is
+    truncated the same way as astype('int16').
+
+    :param pixel_array: raw slice pixels
+    :type pixel_array: numpy array
+    :param slope: rescale slope
+    :type slope: float
+    :param intercept: rescale intercept
+    :type intercept: float
+    :param out: int16 array the rescaled pixels are written to
+    :type out: numpy array
+    :return: out
+    :rtype: numpy array
+    """
+    slope = float(slope)
+    intercept = float(intercept)
+    if slope.is_integer() and intercept.is_integer() and abs(slope) < 2**15 and abs(intercept) < 2**15:
+        np.copyto(out, pixel_array, casting='unsafe')
+        if slope != 1:
+            np.multiply(out, int(slope), out=out, casting='unsafe')
+        if intercept != 0:
+            np.add(out, int(intercept), out=out, casting='unsafe')
+    else:
+        scaled = np.multiply(pixel_array, slope, dtype=np.float64)
+        np.add(scaled, intercept, out=scaled)
+        np.copyto(out, scaled, casting='unsafe')
+
+    return out
+
+
 class DicomReader(object):
     def __init__(self, reader):
         """
@@ -56,36 +212,31 @@ class DicomReader(object):
 
         :param display_time: prints the total read in time in seconds
         :type display_time: bool
-        :return:
-        :rtype:
+        :return: total read in time in seconds
+        :rtype: float
         """
-        t1 = time.time()
+        t1 = time.perf_counter()
         self.read()
         self.separate_modalities_and_images()
         self.image_creation()
-        t2 = time.time()
+        read_time = time.perf_counter() - t1
 
         if display_time:
-            print('Dicom Read Time: ', t2 - t1)
+            print('Dicom Read Time: ', read_time)
+
+        return read_time
 
     def read(self):
         """
-        Reads in the dicom files using a threading process, and the user input "only_tags" determines if only the tags
-        are loaded or the tags and array.
+        Reads in the dicom files using a bounded thread pool, and the user input "only_tags" determines if only the
+        tags are loaded or the tags and array. Large elements such as PixelData are deferred until the array is
+        created. The datasets are kept in the same order as the file list.
 
         """
-        threads = []
-
-        def read_file_thread(file_path):
-            self.ds.append(thread_process_dicom(file_path, stop_before_pixels=self.reader.only_tags))
-
-        for file_path in self.reader.files['Dicom']:
-            thread = threading.Thread(target=read_file_thread, args=(file_path,))
-            threads.append(thread)
-            thread.start()
-
-        for thread in threads:
-            thread.join()
+        read_file = partial(thread_process_dicom, stop_before_pixels=self.reader.only_tags,
+                            defer_size=PIXEL_DEFER_SIZE)
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            self.ds = list(executor.map(read_file, self.reader.files['Dicom']))
 
     def separate_modalities_and_images(self):
         """
@@ -104,29 +255,28 @@ class DicomReader(object):
             images_in_modality = [d for d in self.ds if d['Modality'].value == modality]
             if len(images_in_modality) > 0 and modality in self.reader.only_modality:
                 if modality not in ['US', 'DX', 'MG', 'XA', 'CR', 'RTSTRUCT', 'REG', 'RTDose']:
-                    sorting_tags = np.asarray([[img['SeriesInstanceUID'].value, img['AcquisitionNumber'].value] if
-                                               'AcquisitionNumber' in img and img['AcquisitionNumber'].value is not None
-                                               else [img['SeriesInstanceUID'].value, 1] for img in images_in_modality])
+                    series = {}
+                    for img in images_in_modality:
+                        if 'AcquisitionNumber' in img and img['AcquisitionNumber'].value is not None:
+                            acquisition = img['AcquisitionNumber'].value
+                        else:
+                            acquisition = 1
+                        series.setdefault((img['SeriesInstanceUID'].value, str(acquisition)), []).append(img)
 
-                    unique_tags = np.unique(sorting_tags, axis=0)
-                    for tag in unique_tags:
-                        sorted_idx = np.where((sorting_tags[:, 0] == tag[0]) & (sorting_tags[:, 1] == tag[1]))
-                        image_tags = [images_in_modality[idx] for idx in sorted_idx[0]]
+                    for tag in sorted(series):
+                        image_tags = series[tag]
 
                         if 'ImageOrientationPatient' in image_tags[0] and 'ImagePositionPatient' in image_tags[0]:
-                            orientations = np.asarray([img['ImageOrientationPatient'].value for img in image_tags])
-                            unique_orientations = np.unique(orientations, axis=0)
-                            for orient in unique_orientations:
-                                orient_idx = np.where((orientations[:, 0] == orient[0]) &
-                                                      (orientations[:, 1] == orient[1]) &
-                                                      (orientations[:, 2] == orient[2]) &
-                                                      (orientations[:, 3] == orient[3]) &
-                                                      (orientations[:, 4] == orient[4]) &
-                                                      (orientations[:, 5] == orient[5]))
-
-                                orient_tags = [image_tags[idx] for idx in orient_idx[0]]
-                                correct_orientation = orient_tags[0]['ImageOrientationPatient'].value
-                                position_tags = np.asarray([t['ImagePositionPatient'].value for t in orient_tags])
+                            orientations = {}
+                            for img in image_tags:
+                                orient = tuple(decimal_string_array(img, 'ImageOrientationPatient').tolist())
+                                orientations.setdefault(orient, []).append(img)
+
+                            for orient in sorted(orientations):
+                                orient_tags = orientations[orient]
+                                correct_orientation = np.asarray(orient)
+                                position_tags = np.asarray([decimal_string_array(t, 'ImagePositionPatient')
+                                                            for t in orient_tags])
 
                                 x = np.abs(correct_orientation[0]) + np.abs(correct_orientation[3])
                                 y = np.abs(correct_orientation[1]) + np.abs(correct_orientation[4])
@@ -134,7 +284,7 @@ class DicomReader(object):
 
                                 row_direction = correct_orientation[:3]
                                 column_direction = correct_orientation[3:]
-                                slice_direction = np.cross(row_direction, column_direction)
+                                slice_direction = cross3(row_direction, column_direction)
                                 if x < y and x < z:
                                     if slice_direction[0] > 0:
                                         slice_idx = np.argsort(position_tags[:, 0])
@@ -235,8 +385,8 @@ class Read3D(object):
         if not self.only_tags:
             self._compute_array()
 
-        self.filepaths = [image.filename for image in self.image_set]
-        self.sops = [image.SOPInstanceUID for image in self.image_set]
+        file_sops = list(map(attrgetter('filename', 'SOPInstanceUID'), self.image_set))
+        self.filepaths, self.sops = [list(values) for values in zip(*file_sops)]
         self.plane = self._compute_plane()
         self.spacing = self._compute_spacing()
         self.dimensions = self._compute_dimensions()
@@ -246,32 +396,68 @@ class Read3D(object):
 
     def _compute_array(self):
         """
-        Combines all the slice arrays into a 3D array.
+        Combines all the slice arrays into a 3D array. The array is allocated from the first slice and the remaining
+        slices are decoded straight into it on a thread pool.
         :return:
         :rtype:
         """
-        image_slices = []
-        for _slice in self.image_set:
-            if (0x0028, 0x1052) in _slice:
-                intercept = _slice.RescaleIntercept
-            else:
-                intercept = 0
+        first_pixels = self._decode_slice(self.image_set[0])
+        self.array = np.empty((len(self.image_set),) + first_pixels.shape, dtype=np.int16)
+        self._fill_slice(0, first_pixels)
 
-            if (0x0028, 0x1053) in _slice:
-                slope = _slice.RescaleSlope
-            else:
-                slope = 1
-
-            image_slices.append(((_slice.pixel_array*slope)+intercept).astype('int16'))
-
-            del _slice.PixelData
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            list(executor.map(self._fill_slice, range(1, len(self.image_set))))
 
-        self.array = np.asarray(image_slices)
         if len(self.array.shape) > 3:
             return self.array[0]
         else:
             return self.array
 
+    def _fill_slice(self, index, pixel_array=None):
+        """
+        Rescales a slice into its position in the preallocated array.
+
+        :param index: slice index
+        :type index: int
+        :param pixel_array: already decoded pixels of the slice
+        :type pixel_array: numpy array
+        :return:
+        :rtype:
+        """
+        _slice = self.image_set[index]
+        if pixel_array is None:
+            pixel_array = self._decode_slice(_slice)
+
+        if (0x0028, 0x1052) in _slice:
+            intercept = _slice.RescaleIntercept
+        else:
+            intercept = 0
+
+        if (0x0028, 0x1053) in _slice:
+            slope = _slice.RescaleSlope
+        else:
+            slope = 1
+
+        rescale_pixels(pixel_array, slope, intercept, self.array[index])
+
+    @staticmethod
+    def _decode_slice(_slice):
+        """
+        Reads the slice pixels and releases the slice's PixelData.
+
+        :param _slice: slice dataset
+        :type _slice: pydicom Dataset
+        :return: raw slice pixels
+        :rtype: numpy array
+        """
+        pixel_array = native_pixel_array(_slice)
+        if pixel_array is None:
+            pixel_array = decode_pixel_array(_slice)
+
+        release_pixel_data(_slice)
+
+        return pixel_array
+
     def _compute_plane(self):
         """
         Computes the image plane for the slices
@@ -355,33 +541,21 @@ class Read3D(object):
         :return:
         :rtype:
         """
-        origin = np.asarray(self.image_set[0]['ImagePositionPatient'].value)
+        origin = np.asarray(self.image_set[0]['ImagePositionPatient'].value, dtype=np.float64)
         if 'PatientPosition' in self.image_set[0]:
             self.base_position = self.image_set[0]['PatientPosition'].value
 
-            if self.base_position in ['HFDR', 'FFDR']:
-                if self.only_tags:
-                    self.array = np.rot90(self.array, 3, (1, 2))
-
-                origin[0] = np.double(origin[0]) - self.spacing[0] * (self.dimensions[0] - 1)
-                self.orientation = [-self.orientation[3], -self.orientation[4], -self.orientation[5],
-                                    self.orientation[0], self.orientation[1], self.orientation[2]]
-
-            elif self.base_position in ['HFP', 'FFP']:
-                if self.only_tags:
-                    self.array = np.rot90(self.array, 2, (1, 2))
-
-                origin[0] = np.double(origin[0]) - self.spacing[0] * (self.dimensions[0] - 1)
-                origin[1] = np.double(origin[1]) - self.spacing[1] * (self.dimensions[1] - 1)
-                self.orientation = -np.asarray(self.orientation)
-
-            elif self.base_position in ['HFDL', 'FFDL']:
-                if self.only_tags:
-                    self.array = np.rot90(self.array, 1, (1, 2))
+            if self.base_position in POSITION_CORRECTIONS:
+                rotations, shift, plane_rotation = POSITION_CORRECTIONS[self.base_position]
+                if not self.only_tags:
+                    self.array = np.ascontiguousarray(np.rot90(self.array, rotations, (1, 2)))
 
-                origin[1] = np.double(origin[1]) - self.spacing[1] * (self.dimensions[1] - 1)
-                self.orientation = [self.orientation[3], self.orientation[4], self.orientation[5],
-                                    -self.orientation[0], -self.orientation[1], -self.orientation[2]]
+                directions = np.asarray(self.orientation, dtype=np.float64).reshape(2, 3)
+                origin += (np.asarray(shift) * self.spacing[0:2] * (self.dimensions[0:2] - 1)) @ directions
+                self.orientation = (np.asarray(plane_rotation) @ directions).ravel()
+                if rotations % 2 == 1:
+                    self.dimensions[[0, 1]] = self.dimensions[[1, 0]]
+                    self.spacing[[0, 1]] = self.spacing[[1, 0]]
 
         return origin
 
@@ -398,22 +572,22 @@ class Read3D(object):
         row_direction = self.orientation[:3]
         column_direction = self.orientation[3:]
 
-        slice_direction = np.cross(row_direction, column_direction)
+        slice_direction = cross3(row_direction, column_direction)
         if len(self.image_set) > 1:
-            first = np.dot(slice_direction, self.image_set[0].ImagePositionPatient)
-            second = np.dot(slice_direction, self.image_set[1].ImagePositionPatient)
-            last = np.dot(slice_direction, self.image_set[-1].ImagePositionPatient)
+            positions = np.asarray([decimal_string_array(image, 'ImagePositionPatient') for image in self.image_set])
+            slice_positions = positions @ slice_direction
+            first, second, last = slice_positions[0], slice_positions[1], slice_positions[-1]
             first_last_spacing = np.asarray((last - first) / (len(self.image_set) - 1))
             if np.abs((second - first) - first_last_spacing) > 0.01:
                 if not self.only_tags:
-                    self._find_skipped_slices(slice_direction)
+                    self._find_skipped_slices(slice_positions)
                 slice_spacing = second - first
             else:
                 slice_spacing = np.asarray((last - first) / (len(self.image_set) - 1))
 
             self.spacing[2] = slice_spacing
             
-        mat = np.identity(4, dtype=np.float32)
+        mat = np.identity(4, dtype=np.float64)
         mat[0, :3] = row_direction
         mat[1, :3] = column_direction
         mat[2, :3] = slice_direction
@@ -421,16 +595,20 @@ class Read3D(object):
 
         return mat
 
-    def _find_skipped_slices(self, slice_direction):
-        base_spacing = None
-        for ii in range(len(self.image_set) - 1):
-            position_1 = np.dot(slice_direction, self.image_set[ii].ImagePositionPatient)
-            position_2 = np.dot(slice_direction, self.image_set[ii + 1].ImagePositionPatient)
-            if ii == 0:
-                base_spacing = position_2 - position_1
-            if ii > 0 and np.abs(base_spacing - (position_2 - position_1)) > 0.01:
-                self.unverified = 'Skipped'
-                self.skipped_slice = ii + 1
+    def _find_skipped_slices(self, slice_positions):
+        """
+        Compares every slice step to the first one, the last step that differs is flagged as the skipped slice.
+
+        :param slice_positions: position of each slice along the slice direction
+        :type slice_positions: numpy array
+        :return:
+        :rtype:
+        """
+        steps = np.diff(slice_positions)
+        skipped = np.flatnonzero(np.abs(steps[1:] - steps[0]) > 0.01)
+        if len(skipped) > 0:
+            self.unverified = 'Skipped'
+            self.skipped_slice = int(skipped[-1]) + 2
 
 
 class ReadDX(object):
@@ -458,7 +636,7 @@ class ReadDX(object):
         self.plane = self.image_set[0].ViewPosition
         self.orientation = [1, 0, 0, 0, 1, 0]
         self.origin = np.asarray([0, 0, 0])
-        self.image_matrix = np.identity(4, dtype=np.float32)
+        self.image_matrix = np.identity(4, dtype=np.float64)
         self.dimensions = np.asarray([self.image_set[0]['Columns'].value, self.image_set[0]['Rows'].value, 1])
 
         self.array = None
@@ -472,8 +650,8 @@ class ReadDX(object):
         :return:
         :rtype:
         """
-        self.array = self.image_set[0].pixel_array.astype('int16')
-        del self.image_set[0].PixelData
+        self.array = decode_pixel_array(self.image_set[0]).astype('int16')
+        release_pixel_data(self.image_set[0])
 
         if 'PresentationLUTShape' in self.image_set[0] and self.image_set[0]['PresentationLUTShape'] == 'Inverse':
             self.array = 16383 - self.array
@@ -548,9 +726,10 @@ class ReadMG(object):
         else:
             slope = 1
 
-        self.array = ((self.image_set[0].pixel_array*slope)+intercept).astype('int16')
+        pixel_array = decode_pixel_array(self.image_set[0])
+        self.array = rescale_pixels(pixel_array, slope, intercept, np.empty(pixel_array.shape, dtype=np.int16))
 
-        del self.image_set[0].PixelData
+        release_pixel_data(self.image_set[0])
 
     def _compute_plane(self):
         x = np.abs(self.orientation[0]) + np.abs(self.orientation[3])
@@ -615,14 +794,14 @@ class ReadMG(object):
         row_direction = self.orientation[:3]
         column_direction = self.orientation[3:]
 
-        slice_direction = np.cross(row_direction, column_direction)
+        slice_direction = cross3(row_direction, column_direction)
         if len(self.image_set) > 1:
-            first = np.dot(slice_direction, self.image_set[0].ImagePositionPatient)
-            last = np.dot(slice_direction, self.image_set[-1].ImagePositionPatient)
+            first = decimal_string_array(self.image_set[0], 'ImagePositionPatient') @ slice_direction
+            last = decimal_string_array(self.image_set[-1], 'ImagePositionPatient') @ slice_direction
 
             self.spacing[2] = np.asarray((last - first) / (len(self.image_set) - 1))
 
-        mat = np.identity(4, dtype=np.float32)
+        mat = np.identity(4, dtype=np.float64)
         mat[0, :3] = row_direction
         mat[1, :3] = column_direction
         mat[2, :3] = slice_direction
@@ -656,7 +835,7 @@ class ReadUS(object):
         self.plane = 'Axial'
         self.orientation = [1, 0, 0, 0, 1, 0]
         self.origin = np.asarray([0, 0, 0])
-        self.image_matrix = np.identity(4, dtype=np.float32)
+        self.image_matrix = np.identity(4, dtype=np.float64)
         self.dimensions = np.asarray([self.image_set[0]['Columns'].value, self.image_set[0]['Rows'].value, 1])
 
         self.array = None
@@ -665,19 +844,19 @@ class ReadUS(object):
         self.spacing = self._compute_spacing()
 
     def _compute_array(self):
-        us_data = np.asarray(self.image_set[0].pixel_array)
-        del self.image_set[0].PixelData
+        us_data = np.asarray(decode_pixel_array(self.image_set[0]))
+        release_pixel_data(self.image_set[0])
 
         if len(us_data.shape) == 2:
             us_data = us_data.reshape((1, us_data.shape[0], us_data.shape[1]))
 
-        if len(us_data.shape) == 3:
-            us_binary = (1 * (np.std(us_data, axis=2) == 0) == 1)
-            self.array = (us_binary * us_data[:, :, 0]).astype('uint8')
+        if self.image_set[0].get('SamplesPerPixel', 1) == 1:
+            self.array = us_data.astype('uint8')
 
         else:
-            us_binary = (1 * (np.std(us_data, axis=3) == 0) == 1)
-            self.array = (us_binary * us_data[:, :, :, 0]).astype('uint8')
+            # keeps only the gray pixels, where every value along the last axis equals the first one (R == G == B)
+            us_binary = np.all(us_data == us_data[..., :1], axis=-1)
+            self.array = np.where(us_binary, us_data[..., 0], 0).astype('uint8')
 
         if len(self.array.shape) > 3:
             self.dimensions[2] = self.array.shape[0]
@@ -767,24 +946,25 @@ class ReadRTStruct(object):
     def _structure_positions(self):
         sequences = self.image_set.ROIContourSequence
         for prop in self._properties:
+            contour_list = self._contour_positions(sequences[prop[0]])
             if prop[3].lower() == 'closed_planar':
-                seq = sequences[prop[0]]
-
-                contour_list = []
-                for c in seq.ContourSequence:
-                    contour_hold = np.round(np.array(c['ContourData'].value), 3)
-                    contour = contour_hold.reshape(int(len(contour_hold) / 3), 3)
-                    contour_list.append(contour)
-
                 self.contours += [contour_list]
 
             else:
-                seq = sequences[prop[0]]
+                self.points += contour_list
 
-                contour_list = []
-                for c in seq.ContourSequence:
-                    contour_hold = np.round(np.array(c['ContourData'].value), 3)
-                    contour = contour_hold.reshape(int(len(contour_hold) / 3), 3)
-                    contour_list.append(contour)
+    @staticmethod
+    def _contour_positions(sequence):
+        """
+        Parses every ContourData of a structure, the rounding and reshaping is done once over all the contours and
+        then split back into one (n, 3) array per contour.
 
-                self.points += contour_list
+        :param sequence: ROIContourSequence item of the structure
+        :type sequence: pydicom Dataset
+        :return: contour positions
+        :rtype: list
+        """
+        contour_data = [decimal_string_array(c, 'ContourData') for c in sequence.ContourSequence]
+        positions = np.round(np.concatenate(contour_data), 3).reshape(-1, 3)
+
+        return np.split(positions, np.cumsum([len(data) // 3 for data in contour_data])[:-1])
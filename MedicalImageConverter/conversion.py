@@ -11,10 +11,10 @@ Description:
 """
 
 import os
+from concurrent.futures import ThreadPoolExecutor
 
 import cv2
 import numpy as np
-import pandas as pd
 import pyvista as pv
 import SimpleITK as sitk
 
@@ -22,6 +22,74 @@ import vtk
 from vtk.util import numpy_support
 
 
+def positions_to_pixels(contours, matrix, origin, spacing):
+    """
+    Converts contours from patient position to (fractional) pixel index. All the points are stacked and transformed
+    with one matrix product against the inverse direction, then split back into their contours.
+
+    :param contours: contours in patient position, each an (N, 3) array
+    :type contours: list
+    :param matrix: image matrix, the direction is the upper 3x3
+    :type matrix: numpy array
+    :param origin: image origin
+    :type origin: list
+    :param spacing: image spacing
+    :type spacing: list
+    :return: contours in pixel index
+    :rtype: list
+    """
+    if len(contours) == 0:
+        return []
+
+    lengths = [len(contour) for contour in contours]
+    positions = np.vstack([np.asarray(contour, dtype=np.float64).reshape(-1, 3) for contour in contours])
+    inverse_direction = np.linalg.inv(np.asarray(matrix, dtype=np.float64)[0:3, 0:3])
+    pixels = (positions - np.asarray(origin, dtype=np.float64)) @ inverse_direction
+    pixels /= np.asarray(spacing, dtype=np.float64)
+
+    return np.split(pixels, np.cumsum(lengths)[:-1])
+
+
+def fill_contours(frame, contours):
+    """
+    Fills the contours of a single slice into its mask frame. Each contour's nesting depth is the number of the other
+    contours that fully contain it, duplicate contours (each containing the other) are only counted once. Contours at
+    an even depth are filled and contours at an odd depth are cut out as holes, drawn from the outermost level inwards,
+    so overlapping contours that are not nested give their union.
+
+    :param frame: 2D mask slice
+    :type frame: numpy array
+    :param contours: contours of the slice in pixel space, x and y in the first two columns
+    :type contours: list
+    :return:
+    :rtype:
+    """
+    polygons = [contour[:, 0:2].astype(np.int32) for contour in contours]
+    if len(polygons) == 1:
+        # noinspection PyTypeChecker
+        cv2.fillPoly(frame, polygons, 1)
+        return
+
+    lows = [polygon.min(axis=0) for polygon in polygons]
+    highs = [polygon.max(axis=0) for polygon in polygons]
+
+    def contains(outer, inner):
+        if np.any(lows[inner] < lows[outer]) or np.any(highs[inner] > highs[outer]):
+            return False
+
+        return all(cv2.pointPolygonTest(polygons[outer], (float(x), float(y)), False) >= 0
+                   for x, y in polygons[inner])
+
+    indices = range(len(polygons))
+    inside = [[jj != ii and contains(jj, ii) for jj in indices] for ii in indices]
+    kept = [ii for ii in indices if not any(inside[ii][jj] and inside[jj][ii] for jj in range(ii))]
+    depths = [sum(inside[ii][jj] for jj in kept) for ii in kept]
+
+    for depth, polygon in sorted(zip(depths, [polygons[ii] for ii in kept]), key=lambda item: item[0]):
+        # noinspection PyTypeChecker
+        cv2.fillPoly(frame, [polygon], 1 - depth % 2)
+
+
 class ContourToDiscreteMesh(object):
     def __init__(self, contour_position=None, contour_pixel=None, spacing=None, origin=None, dimensions=None, matrix=None):
         self.contour_position = contour_position
@@ -34,45 +102,33 @@ class ContourToDiscreteMesh(object):
         self.mask = None
         self.mesh = None
 
-    def create_mesh(self):
-        if self.contour_pixel is not None:
+    def create_mask(self):
+        if self.contour_pixel is None:
             self.convert_to_pixel_spacing()
 
-        if self.mask is not None:
+        if self.mask is None:
             self.compute_mask()
 
+    def create_mesh(self):
+        self.create_mask()
         self.compute_mesh()
 
     def convert_to_pixel_spacing(self):
-        sitk_image = sitk.Image([int(dim) for dim in self.dimensions], sitk.sitkUInt8)
-        matrix_flat = self.image_matrix[0:3, 0:3].flatten(order='F')
-        sitk_image.SetDirection([float(mat) for mat in matrix_flat])
-        sitk_image.SetOrigin(self.origin)
-        sitk_image.SetSpacing(self.spacing)
-
-        self.contour_pixel = [[]] * len(self.contour_position)
-        for ii, contours in enumerate(self.contour_position):
-            self.contour_pixel[ii] = [sitk_image.TransformPhysicalPointToContinuousIndex(contour) for contour in contours]
+        self.contour_pixel = positions_to_pixels(self.contour_position, self.matrix, self.origin, self.spacing)
 
     def compute_mask(self):
-        slice_check = np.zeros(self.dimensions[2])
-        hold_mask = np.zeros([self.dimensions[2], self.dimensions[0], self.dimensions[1]], dtype=np.uint8)
+        self.mask = np.zeros([self.dimensions[2], self.dimensions[0], self.dimensions[1]], dtype=np.uint8)
+
+        slice_contours = {}
         for c in self.contour_pixel:
-            contour_stacked = np.vstack((c[:, 0:2], c[0, 0:2]))
-            new_contour = np.array([contour_stacked], dtype=np.int32)
-            image = np.zeros([self.dimensions[0], self.dimensions[1]], dtype=np.uint8)
-            cv2.fillPoly(image, new_contour, 1)
-
-            slice_num = int(c[0, 2])
-            if slice_check[slice_num] == 0:
-                hold_mask[slice_num, :, :] = image
-                slice_check[slice_num] = 1
-            else:
-                hold_mask[slice_num, :, :] = hold_mask[slice_num, :, :] + image
-        self.mask = (hold_mask > 0).astype(np.uint8)
+            slice_contours.setdefault(int(c[0, 2]), []).append(c)
+
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            list(executor.map(fill_contours, [self.mask[s] for s in slice_contours], slice_contours.values()))
 
     def compute_mesh(self):
-        label = numpy_support.numpy_to_vtk(num_array=np.asarray(self.mask).ravel(), deep=True, array_type=vtk.VTK_FLOAT)
+        self.mask = np.ascontiguousarray(self.mask, dtype=np.uint8)
+        label = numpy_support.numpy_to_vtk(num_array=self.mask.ravel(), deep=False, array_type=vtk.VTK_UNSIGNED_CHAR)
         img_vtk = vtk.vtkImageData()
         img_vtk.SetDimensions([self.dimensions[1], self.dimensions[0], self.dimensions[2]])
         img_vtk.SetSpacing([self.spacing[1], self.spacing[0], self.spacing[2]])
@@ -100,38 +156,23 @@ class ContourToMask(object):
         self.mask = None
 
     def create_mask(self):
-        if self.contour_pixel is not None:
+        if self.contour_pixel is None:
             self.convert_to_pixel_spacing()
 
         self.compute_mask()
 
     def convert_to_pixel_spacing(self):
-        sitk_image = sitk.Image([int(dim) for dim in self.dimensions], sitk.sitkUInt8)
-        matrix_flat = self.image_matrix[0:3, 0:3].flatten(order='F')
-        sitk_image.SetDirection([float(mat) for mat in matrix_flat])
-        sitk_image.SetOrigin(self.origin)
-        sitk_image.SetSpacing(self.spacing)
-
-        self.contour_pixel = [[]] * len(self.contour_position)
-        for ii, contours in enumerate(self.contour_position):
-            self.contour_pixel[ii] = [sitk_image.TransformPhysicalPointToContinuousIndex(contour) for contour in contours]
+        self.contour_pixel = positions_to_pixels(self.contour_position, self.matrix, self.origin, self.spacing)
 
     def compute_mask(self):
-        slice_check = np.zeros(self.dimensions[2])
-        hold_mask = np.zeros([self.dimensions[2], self.dimensions[0], self.dimensions[1]], dtype=np.uint8)
+        self.mask = np.zeros([self.dimensions[2], self.dimensions[0], self.dimensions[1]], dtype=np.uint8)
+
+        slice_contours = {}
         for c in self.contour_pixel:
-            contour_stacked = np.vstack((c[:, 0:2], c[0, 0:2]))
-            new_contour = np.array([contour_stacked], dtype=np.int32)
-            image = np.zeros([self.dimensions[0], self.dimensions[1]], dtype=np.uint8)
-            cv2.fillPoly(image, new_contour, 1)
+            slice_contours.setdefault(int(c[0, 2]), []).append(c)
 
-            slice_num = int(c[0, 2])
-            if slice_check[slice_num] == 0:
-                hold_mask[slice_num, :, :] = image
-                slice_check[slice_num] = 1
-            else:
-                hold_mask[slice_num, :, :] = hold_mask[slice_num, :, :] + image
-        self.mask = (hold_mask > 0).astype(np.uint8)
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            list(executor.map(fill_contours, [self.mask[s] for s in slice_contours], slice_contours.values()))
 
 
 class ModelToMask:
@@ -181,11 +222,11 @@ class ModelToMask:
         -------
 
         """
-        model_bounds = [model.GetBounds() for model in self.models]
-        model_min = np.min(model_bounds, axis=0)
-        model_max = np.max(model_bounds, axis=0)
+        model_bounds = np.asarray([model.GetBounds() for model in self.models], dtype=np.float64)
+        model_min = model_bounds[:, 0::2].min(axis=0)
+        model_max = model_bounds[:, 1::2].max(axis=0)
 
-        model_min_max = [model_min[0], model_max[1], model_min[2], model_max[3], model_min[4], model_max[5]]
+        model_min_max = [model_min[0], model_max[0], model_min[1], model_max[1], model_min[2], model_max[2]]
 
         if model_min_max[1] - model_min_max[0] < 512 and model_min_max[3] - model_min_max[2] < 512:
             if model_min_max[5] - model_min_max[4] < 450:
@@ -205,23 +246,52 @@ class ModelToMask:
 
     def compute_contours(self):
         """
-        Compute the contours along the z-axis for all models.
+        Compute the contours along the z-axis for all models. Each model is cut by every slice location inside its
+        bounds in a single vtkCutter pass, the cut segments are joined into ordered polylines and then grouped back
+        onto their slice. Every polyline is kept as its own contour, a slice can cut a model into several loops.
         Returns
         -------
 
         """
+        slice_locations = np.asarray(self.slice_locations, dtype=np.float64)
+        origin_xy = np.asarray([self.bounds[0], self.bounds[2]], dtype=np.float64)
+        inverse_spacing_xy = 1 / np.asarray(self.spacing[0:2], dtype=np.float64)
         for model in self.models:
-            com = model.center
             org_bounds = model.GetBounds()
-
-            model_contours = []
-            for s in self.slice_locations:
-                if org_bounds[4] < s < org_bounds[5]:
-                    hold_contour = model.slice(normal='z', origin=[com[0], com[1], s])
-                    model_contours.append((np.asarray(hold_contour.points)[:, 0:2] -
-                                     (self.bounds[0], self.bounds[2])) / (self.spacing[0:2]))
-                else:
-                    model_contours.append([])
+            model_contours = [[] for _ in self.slice_locations]
+
+            active = np.flatnonzero((slice_locations > org_bounds[4]) & (slice_locations < org_bounds[5]))
+            if len(active) > 0:
+                plane = vtk.vtkPlane()
+                plane.SetOrigin(0, 0, 0)
+                plane.SetNormal(0, 0, 1)
+
+                cutter = vtk.vtkCutter()
+                cutter.SetInputData(model)
+                cutter.SetCutFunction(plane)
+                for ii, index in enumerate(active):
+                    cutter.SetValue(ii, slice_locations[index])
+
+                stripper = vtk.vtkStripper()
+                stripper.SetInputConnection(cutter.GetOutputPort())
+                stripper.JoinContiguousSegmentsOn()
+                stripper.Update()
+
+                cut = pv.wrap(stripper.GetOutput())
+                points = np.asarray(cut.points)
+                lines = np.asarray(cut.lines)
+
+                slice_ids = {}
+                ii = 0
+                while ii < len(lines):
+                    point_ids = lines[ii + 1:ii + 1 + lines[ii]]
+                    ii += 1 + lines[ii]
+                    index = active[np.argmin(np.abs(slice_locations[active] - points[point_ids[0], 2]))]
+                    slice_ids.setdefault(index, []).append(point_ids)
+
+                xy = (points[:, 0:2] - origin_xy) * inverse_spacing_xy
+                for index, point_ids in slice_ids.items():
+                    model_contours[index] = [xy[ids].astype(np.int32) for ids in point_ids]
 
             self.contours.append(model_contours)
 
@@ -233,19 +303,26 @@ class ModelToMask:
         -------
 
         """
-        self.mask = np.zeros((self.dims[0], self.dims[2], self.dims[1]))
+        self.mask = np.zeros((self.dims[0], self.dims[2], self.dims[1]), dtype=np.uint8)
         if not self.empty_array:
-            for ii, model in enumerate(self.models):
+            with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+                list(executor.map(self.fill_slice, range(len(self.slice_locations))))
 
-                model_contours = self.contours[ii]
-                for jj, s in enumerate(self.slice_locations):
-                    if len(model_contours[jj]) > 0:
-                        frame = np.zeros((self.dims[2], self.dims[1]))
-                        # noinspection PyTypeChecker
-                        cv2.fillPoly(frame, np.array([model_contours[jj]], dtype=np.int32), 1)
-                        self.mask[jj, :, :] = self.mask[jj, :, :] + frame
+    def fill_slice(self, jj):
+        """
+        Fills every model's contour on a single slice into the mask, each slice is only written by one thread.
+        Parameters
+        ----------
+        jj - slice index
 
-        self.mask = self.mask.astype(np.int8)
+        Returns
+        -------
+
+        """
+        for model_contours in self.contours:
+            if len(model_contours[jj]) > 0:
+                # noinspection PyTypeChecker
+                cv2.fillPoly(self.mask[jj], model_contours[jj], 1)
 
     def save_image(self, path):
         """
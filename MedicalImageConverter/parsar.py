@@ -41,41 +41,29 @@ def file_parsar(path, exclude_files=None):
     vtk_files = []
     mf3_files = []
 
-    if not exclude_files:
-        exclude_files = []
+    extension_files = {'.dcm': dicom_files,
+                       '.mhd': mhd_files,
+                       '.raw': raw_files,
+                       '.stl': stl_files,
+                       '.vtk': vtk_files,
+                       '.3mf': mf3_files,
+                       '': no_file_extension}
 
-    for root, dirs, files in os.walk(path):
-        if files:
-            for name in files:
-                filepath = os.path.join(root, name)
-
-                if filepath not in exclude_files:
-                    filename, file_extension = os.path.splitext(filepath)
-
-                    if file_extension == '.dcm':
-                        dicom_files.append(filepath)
-
-                    elif file_extension == '.mhd':
-                        mhd_files.append(filepath)
+    exclude_files = set(exclude_files) if exclude_files else set()
 
-                    elif file_extension == '.raw':
-                        raw_files.append(filepath)
-
-                    elif file_extension == '.gz':
-                        if filepath[-6:] == 'nii.gz':
-                            nifti_files.append(filepath)
-
-                    elif file_extension == '.stl':
-                        stl_files.append(filepath)
+    for root, dirs, files in os.walk(path):
+        for name in files:
+            filepath = os.path.join(root, name)
 
-                    elif file_extension == '.vtk':
-                        vtk_files.append(filepath)
+            if filepath not in exclude_files:
+                file_extension = os.path.splitext(name)[1]
 
-                    elif file_extension == '.3mf':
-                        mf3_files.append(filepath)
+                if file_extension in extension_files:
+                    extension_files[file_extension].append(filepath)
 
-                    elif file_extension == '':
-                        no_file_extension.append(filepath)
+                elif file_extension == '.gz':
+                    if filepath[-6:] == 'nii.gz':
+                        nifti_files.append(filepath)
 
     file_dictionary = {'Dicom': dicom_files,
                        'MHD': mhd_files,
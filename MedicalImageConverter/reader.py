@@ -81,14 +81,17 @@ class Reader:
         self.dose = []
         self.meshes = []
 
-    def read_dicoms(self):
+    def read_dicoms(self, display_time=False):
         """
         Reads in all dicom files and separates them into the image list variable.
-        :return:
-        :rtype:
+
+        :param display_time: prints the total read in time in seconds
+        :type display_time: bool
+        :return: total read in time in seconds
+        :rtype: float
         """
         dicom_reader = DicomReader(self)
-        dicom_reader.load()
+        return dicom_reader.load(display_time=display_time)
 
     def read_rtstruct_only(self, base_image=None):
         print('reader')
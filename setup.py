@@ -20,5 +20,5 @@ setup(
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: GNU Affero General Public License v3",
     ],
-    install_requires=['numpy', 'pandas', 'psutil', 'pydicom', 'pyvista', 'python-gdcm', 'opencv-python', 'SimpleITK'],
+    install_requires=['numpy', 'psutil', 'pydicom', 'pyvista', 'python-gdcm', 'opencv-python', 'SimpleITK'],
 )